@@ -1,193 +1,240 @@
 import os
 import csv
+import io
+import itertools
 import re
 import requests
-import xml.etree.ElementTree as ET
+from requests.adapters import HTTPAdapter
+from lxml import etree as ET
 from fpdf import FPDF
+from fpdf.line_break import BREAKING_SPACE_SYMBOLS_STR, FORM_FEED, NBSP, NEWLINE, SOFT_HYPHEN, SPACE
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-import traceback
+import logging
 
-# Log helper function
-def log(message, emoji="ℹ️"):
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    print(f"[{timestamp}] {emoji} {message}")
+# Namespace-qualified TTML tags, built once instead of per element
+TTML_NAMESPACE = "{http://www.w3.org/ns/ttml}"
+TTML_P_TAG = TTML_NAMESPACE + "p"
 
-# Ensure that the Unicode font is available; download if not present
-def ensure_font(font_filename="DejaVuSans.ttf"):
+# WebVTT cues are separated by blank (or whitespace-only) lines
+VTT_BLOCK_SEPARATOR_RE = re.compile(r"\n[ \t]*\n")
+
+# Inline <font> markup that some VTT providers leave in cue text
+FONT_TAG_RE = re.compile(r"</?font[^>]*>")
+
+# Anything other than word characters, spaces and dashes is replaced in output filenames
+UNSAFE_FILENAME_RE = re.compile(r"[^\w \-]")
+
+# Characters fpdf's line breaker treats specially (soft hyphens, non-breaking and
+# zero-width spaces, tabs, newlines). Taken from fpdf itself so the set follows upgrades;
+# cues containing any of them are always laid out by multi_cell.
+MULTI_CELL_ONLY_RE = re.compile(
+    "[" + re.escape(BREAKING_SPACE_SYMBOLS_STR.replace(SPACE, "") + SOFT_HYPHEN + NBSP + NEWLINE + FORM_FEED) + "]"
+)
+
+FONT_FILENAME = "DejaVuSans.ttf"
+
+# Number of CSV rows processed concurrently
+MAX_WORKERS = 8
+
+# Shared HTTP session so requests to the same host reuse pooled keep-alive connections
+SESSION = requests.Session()
+SESSION.mount("http://", HTTPAdapter(pool_connections=16, pool_maxsize=16))
+SESSION.mount("https://", HTTPAdapter(pool_connections=16, pool_maxsize=16))
+
+# Module logger; handlers are thread-safe and messages are only formatted if the level is enabled
+logger = logging.getLogger(__name__)
+
+# Ensure that the Unicode font is available; download if not present.
+# Returns the absolute font path so callers can skip any further lookups.
+def ensure_font(font_filename=FONT_FILENAME):
     if not os.path.exists(font_filename):
-        log(f"Downloading {font_filename} for Unicode support", "🌍")
+        logger.info("🌍 Downloading %s for Unicode support", font_filename)
         # Use Matplotlib's DejaVuSans.ttf as a reliable TrueType font source
         font_url = "https://github.com/matplotlib/matplotlib/blob/main/lib/matplotlib/mpl-data/fonts/ttf/DejaVuSans.ttf?raw=true"
+        # Stream straight to disk; write to a temp name so a broken download is never mistaken for the font
+        partial_filename = f"{font_filename}.part"
         try:
-            r = requests.get(font_url, timeout=10)
-            r.raise_for_status()
-            with open(font_filename, "wb") as f:
-                f.write(r.content)
-            log(f"{font_filename} downloaded successfully.", "✅")
+            with SESSION.get(font_url, stream=True, timeout=10) as r:
+                r.raise_for_status()
+                with open(partial_filename, "wb") as f:
+                    # iter_content (unlike r.raw) turns mid-download resets and timeouts into RequestException
+                    for chunk in r.iter_content(chunk_size=1 << 16):
+                        f.write(chunk)
+            os.replace(partial_filename, font_filename)
+            logger.info("✅ %s downloaded successfully.", font_filename)
         except requests.exceptions.RequestException as e:
-            log(f"Failed to download {font_filename}: {e}", "❌")
+            logger.error("❌ Failed to download %s: %s", font_filename, e)
             raise
+        finally:
+            if os.path.exists(partial_filename):
+                os.remove(partial_filename)
+    return os.path.abspath(font_filename)
 
 # Function to fetch subtitles from a URL
 def fetch_subtitles(url):
     try:
-        log(f"Fetching subtitles from {url}", "🌍")
-        response = requests.get(url, timeout=10)
+        logger.info("🌍 Fetching subtitles from %s", url)
+        response = SESSION.get(url, timeout=10)
         response.raise_for_status()
         return response.text
     except requests.exceptions.RequestException as e:
-        log(f"Failed to fetch subtitles: {e}", "❌")
+        logger.error("❌ Failed to fetch subtitles: %s", e)
         return None
 
-# Function to parse the EBU-TT subtitle XML format
+# Function to parse the EBU-TT subtitle XML format, yielding (start_time, text) per cue.
+# Malformed XML raises ET.ParseError to the consumer, so a truncated document never
+# turns into a truncated PDF.
 def parse_ebu_tt(xml_content):
-    try:
-        log("Parsing EBU-TT subtitle XML...", "📜")
-        root = ET.fromstring(xml_content)
-        namespace = {'tt': 'http://www.w3.org/ns/ttml'}
-
-        subtitles = []
-        for p in root.findall(".//tt:p", namespace):
-            start_time = p.attrib.get("begin", "00:00:00.000")
-            text_content = " ".join(p.itertext()).strip()
-            if text_content:
-                subtitles.append(f"[{str(start_time)}]: {str(text_content)}")
-        return subtitles
-    except ET.ParseError as e:
-        log(f"Error parsing XML: {e}", "❌")
-        return None
-
-# Function to parse WebVTT subtitle files
+    logger.info("📜 Parsing EBU-TT subtitle XML...")
+    source = io.BytesIO(xml_content.encode("utf-8"))
+
+    # Stream the document and drop each <p> once handled so memory stays flat
+    for _, p in ET.iterparse(source, events=("end",), tag=TTML_P_TAG, encoding="utf-8"):
+        start_time = p.attrib.get("begin", "00:00:00.000")
+        # Join the stripped text nodes so span/br boundaries yield a single space
+        text_content = " ".join(t for t in map(str.strip, p.itertext()) if t)
+        if text_content:
+            yield start_time, text_content
+        p.clear()
+        while p.getprevious() is not None:
+            del p.getparent()[0]
+
+# Function to parse WebVTT subtitle files, yielding (start_time, text) per cue
 def parse_vtt(vtt_content):
-    try:
-        log("Parsing VTT subtitles...", "📜")
-        subtitles = []
-        lines = vtt_content.splitlines()
-        # Remove header if present
-        if lines and lines[0].strip().startswith("WEBVTT"):
-            lines = lines[1:]
-        
-        block = []
-        for line in lines:
-            if line.strip() == "":
-                if block:
-                    time_line = None
-                    text_lines = []
-                    for item in block:
-                        if "-->" in item:
-                            time_line = item.strip()
-                        else:
-                            text_lines.append(item.strip())
-                    # Filter out lines that are just an index number
-                    text_lines = [t for t in text_lines if not t.isdigit()]
-                    if time_line:
-                        parts = time_line.split("-->")
-                        start_time = parts[0].strip() if parts else "00:00:00.000"
-                        text_content = " ".join(text_lines).strip()
-                        if text_content:
-                            subtitles.append(f"[{start_time}]: {text_content}")
-                    block = []
-            else:
-                block.append(line)
-        # Process any remaining block
-        if block:
-            time_line = None
-            text_lines = []
-            for item in block:
-                if "-->" in item:
-                    time_line = item.strip()
-                else:
-                    text_lines.append(item.strip())
-            text_lines = [t for t in text_lines if not t.isdigit()]
-            if time_line:
-                parts = time_line.split("-->")
-                start_time = parts[0].strip() if parts else "00:00:00.000"
-                text_content = " ".join(text_lines).strip()
-                if text_content:
-                    subtitles.append(f"[{start_time}]: {text_content}")
-        return subtitles
-    except Exception as e:
-        log(f"Error parsing VTT: {e}", "❌")
-        return None
+    logger.info("📜 Parsing VTT subtitles...")
+    # WebVTT allows CRLF, LF or bare CR line endings
+    content = vtt_content.replace("\r\n", "\n").replace("\r", "\n")
+    for block in VTT_BLOCK_SEPARATOR_RE.split(content):
+        # Blocks without a timing line (header, NOTE, STYLE) are skipped
+        head, arrow, rest = block.partition("-->")
+        if not arrow:
+            continue
+        start_time = head.rpartition("\n")[2].strip()
+        # Cue text follows the timing line; filter out lines that are just an index number
+        text_lines = [t for t in map(str.strip, rest.split("\n")[1:]) if t and not t.isdigit()]
+        # Remove any font tags; TTML cues never need this since itertext() skips markup
+        text_content = FONT_TAG_RE.sub("", " ".join(text_lines))
+        if text_content:
+            yield start_time, text_content
+
+# fpdf's multi_cell re-measures the whole line for every character it adds, which
+# dominates long subtitle lists. Most cues fit on one line, and there multi_cell draws
+# exactly what a left-aligned cell() does (the last line of a paragraph is never
+# justified), so one measurement is enough to take the cheap path. Anything that wraps
+# stays with multi_cell: it justifies all but the last line, which cell() cannot do.
+# Text with soft hyphens or special spaces also goes to multi_cell, which treats them
+# differently from plain glyphs.
+def fits_on_one_line(pdf, text, max_width):
+    return not MULTI_CELL_ONLY_RE.search(text) and pdf.get_string_width(text) <= max_width
+
+# Write one formatted cue the way multi_cell(0, 10, ...) would, using cell() when it can
+def write_cue(pdf, text, max_width):
+    if fits_on_one_line(pdf, text, max_width):
+        pdf.cell(0, 10, text, new_x="LMARGIN", new_y="NEXT")
+    else:
+        pdf.multi_cell(0, 10, text, new_x="LMARGIN", new_y="NEXT")
 
 # Function to generate a PDF from subtitles with full Unicode support
-def create_pdf(title, subtitles, output_folder):
+def create_pdf(title, subtitles, output_folder, font_filename=FONT_FILENAME):
     try:
         title_str = str(title)
-        safe_title = "".join(c if c.isalnum() or c in " _-" else "_" for c in title_str)
+        safe_title = UNSAFE_FILENAME_RE.sub("_", title_str)
         filename = os.path.join(output_folder, f"{safe_title}.pdf")
-        log(f"Generating PDF: {filename}", "🖨️")
-
-        font_filename = "DejaVuSans.ttf"
-        ensure_font(font_filename)
+        logger.info("🖨️ Generating PDF: %s", filename)
 
         pdf = FPDF()
         pdf.set_auto_page_break(auto=True, margin=15)
         pdf.add_page()
         
-        pdf.add_font("DejaVu", "", font_filename, uni=True)
+        pdf.add_font("DejaVu", "", font_filename)
         pdf.set_font("DejaVu", "", 12)
 
-        pdf.cell(0, 10, title_str, ln=True, align="C")
+        pdf.cell(0, 10, title_str, new_x="LMARGIN", new_y="NEXT", align="C")
         pdf.ln(5)
 
-        for i, subtitle in enumerate(subtitles):
+        # Same usable width multi_cell(0, ...) would wrap to
+        max_width = pdf.epw - 2 * pdf.c_margin
+        # Errors raised by the parser while fetching the next cue come from the for
+        # statement itself and go straight to the outer handler; only rendering
+        # failures are attributed to a cue. The try costs nothing on 3.11+ unless it fires.
+        for i, cue in enumerate(subtitles):
             try:
-                # log(f"Adding subtitle {i}: {subtitle} (type: {type(subtitle)})", "🔍")
-                # Remove any font tags using regex
-                subtitle_clean = re.sub(r'</?font[^>]*>', '', str(subtitle))
-                pdf.multi_cell(0, 10, subtitle_clean)
+                start_time, text_content = cue
+                subtitle = f"[{start_time}]: {text_content}"
+                write_cue(pdf, subtitle, max_width)
                 pdf.ln(2)
-            except Exception as e:
-                log(f"Error adding subtitle at index {i}: {subtitle} (type: {type(subtitle)}): {e}", "❌")
-                log("Full traceback:", "❌")
-                log(traceback.format_exc(), "❌")
+            except Exception:
+                # The outer handler logs the traceback; just record which cue failed
+                logger.error("❌ Error adding subtitle at index %d: %r", i, cue)
                 raise
 
-        pdf.output(filename, "F")
-        log(f"PDF saved: {filename}", "✅")
+        pdf.output(filename)
+        logger.info("✅ PDF saved: %s", filename)
     except Exception as e:
-        log(f"Error generating PDF: {e}", "❌")
-        log("Full traceback:", "❌")
-        log(traceback.format_exc(), "❌")
+        logger.exception("❌ Error generating PDF: %s", e)
+
+# Fetch, parse and render a single CSV row
+def process_row(title, url, output_folder, font_filename=FONT_FILENAME):
+    logger.info("🎬 Processing: %s", title)
+
+    content = fetch_subtitles(url)
+    if content:
+        if url.lower().endswith(".vtt") or content.strip().startswith("WEBVTT"):
+            subtitles = parse_vtt(content)
+        else:
+            subtitles = parse_ebu_tt(content)
+        # Parsers are lazy; peek at the first cue so empty results are still caught.
+        # A parse error later in the document aborts create_pdf before anything is written.
+        try:
+            first = next(subtitles, None)
+        except ET.ParseError as e:
+            logger.error("❌ Error parsing XML for %s: %s", title, e)
+            return
+        if first is not None:
+            create_pdf(title, itertools.chain([first], subtitles), output_folder, font_filename)
+        else:
+            logger.error("❌ No subtitles found for %s", title)
 
 # Main function to process the CSV
 def process_csv(csv_filename):
     if not os.path.exists(csv_filename):
-        log(f"CSV file not found: {csv_filename}", "❌")
+        logger.error("❌ CSV file not found: %s", csv_filename)
         return
 
+    # Fetch the font once up front rather than checking for it per PDF
+    font_path = ensure_font(FONT_FILENAME)
+
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     output_folder = f"pdf_output_{timestamp}"
     os.makedirs(output_folder, exist_ok=True)
-    log(f"PDF output folder created: {output_folder}", "📁")
+    logger.info("📁 PDF output folder created: %s", output_folder)
 
-    with open(csv_filename, mode="r", encoding="utf-8") as file:
+    # newline="" lets the csv module handle line endings; a 1 MiB buffer cuts read calls on large lists
+    with open(csv_filename, mode="r", encoding="utf-8", newline="", buffering=1 << 20) as file:
         reader = csv.reader(file, delimiter=";")
         next(reader)  # Skip header row
-        
-        for row in reader:
-            if len(row) < 2:
-                log("Invalid row format, skipping.", "❌")
-                continue
-
-            title, url = row
-            log(f"Processing: {title}", "🎬")
-
-            content = fetch_subtitles(url)
-            if content:
-                if url.lower().endswith(".vtt") or content.strip().startswith("WEBVTT"):
-                    subtitles = parse_vtt(content)
-                else:
-                    subtitles = parse_ebu_tt(content)
-                if subtitles:
-                    create_pdf(title, subtitles, output_folder)
-                else:
-                    log(f"No subtitles found for {title}", "❌")
+
+        # Rows are independent and mostly wait on the network, so run them on a thread pool
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            futures = []
+            for row in reader:
+                if len(row) < 2:
+                    logger.error("❌ Invalid row format, skipping.")
+                    continue
+
+                title, url = row[:2]
+                futures.append(executor.submit(process_row, title, url, output_folder, font_path))
+
+            for future in futures:
+                future.result()
 
 # Run the script
 if __name__ == "__main__":
     csv_file = "subtitles.csv"
-    log("Starting subtitle to PDF conversion tool", "🚀")
+    # Only this script logs at INFO; libraries such as fontTools stay at the default WARNING
+    logging.basicConfig(format="[%(asctime)s] %(message)s", datefmt="%Y-%m-%d %H:%M:%S")
+    logger.setLevel(logging.INFO)
+    logger.info("🚀 Starting subtitle to PDF conversion tool")
     process_csv(csv_file)
-    log("Processing complete!", "🏁")
\ No newline at end of file
+    logger.info("🏁 Processing complete!")
\ No newline at end of file
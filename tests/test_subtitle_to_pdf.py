@@ -0,0 +1,53 @@
+import datetime
+import os
+
+import pytest
+from fpdf import FPDF
+
+import subtitle_to_pdf
+
+FONT_PATH = os.path.join(os.path.dirname(subtitle_to_pdf.__file__), subtitle_to_pdf.FONT_FILENAME)
+
+# Cues exercising everything fpdf's line breaker treats specially, plus plain text
+CUES = [
+    "[00:00:01.000]: Hallo",
+    "[00:00:01.000]: Plain  text  with   runs of spaces",
+    "[00:00:01.000]: " + "Ich weiß nicht, was du meinst. " * 3,
+    "[00:00:01.000]: " + "word " * 10 + "alpha​beta​gamma",
+    "[00:00:01.000]: " + "word " * 30 + "alpha​beta​gamma",
+    "[00:00:01.000]: short​zero width",
+    "[00:00:01.000]: word\xadshy",
+    "[00:00:01.000]: " + "word\xadshy " * 40,
+    "[00:00:01.000]: non\xa0breaking",
+    "[00:00:01.000]: tab\tseparated",
+    "[00:00:01.000]: well-known " * 12,
+    "[00:00:01.000]: " + "x" * 200,
+]
+
+
+def new_pdf():
+    pdf = FPDF()
+    pdf.set_creation_date(datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc))
+    pdf.set_auto_page_break(auto=True, margin=15)
+    pdf.add_page()
+    pdf.add_font("DejaVu", "", FONT_PATH)
+    pdf.set_font("DejaVu", "", 12)
+    return pdf
+
+
+@pytest.mark.parametrize("text", CUES)
+def test_fits_on_one_line_agrees_with_multi_cell(text):
+    pdf = new_pdf()
+    max_width = pdf.epw - 2 * pdf.c_margin
+    lines = pdf.multi_cell(0, 10, text, dry_run=True, output="LINES")
+    if subtitle_to_pdf.fits_on_one_line(pdf, text, max_width):
+        assert lines == [text]
+
+
+def test_write_cue_renders_like_multi_cell():
+    fast, reference = new_pdf(), new_pdf()
+    max_width = fast.epw - 2 * fast.c_margin
+    for text in CUES:
+        subtitle_to_pdf.write_cue(fast, text, max_width)
+        reference.multi_cell(0, 10, text, new_x="LMARGIN", new_y="NEXT")
+    assert bytes(fast.output()) == bytes(reference.output())